@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+MODEL = "gemini-2.5-flash"
+
+# --------------------------
+# Background event loop
+# --------------------------
+# Flask handlers are synchronous, so all async Gemini work runs on one
+# long-lived loop in a daemon thread. A single loop keeps the async HTTP
+# session of the genai client bound to the loop that created it.
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="gemini-loop", daemon=True).start()
+    return _loop
+
+
+def submit(coro):
+    """Schedule a coroutine on the background loop and return a concurrent Future"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+
+def run(coro):
+    """Run a coroutine on the background loop and block until it finishes"""
+    return submit(coro).result()
+
+
+# --------------------------
+# Gemini calls
+# --------------------------
+def _is_transient(exc):
+    """Server errors and rate limiting (429) are worth retrying; bad requests are not"""
+    # Imported here so importing this module doesn't load google.genai
+    from google.genai import errors
+    return isinstance(exc, errors.ServerError) or (
+        isinstance(exc, errors.ClientError) and exc.code == 429
+    )
+
+
+@retry(
+    retry=retry_if_exception(_is_transient),
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=0.5, max=8),
+    reraise=True
+)
+async def gemini_call(client, prompt):
+    """Send one prompt to Gemini, retrying transient errors with exponential backoff"""
+    response = await client.aio.models.generate_content(
+        model=MODEL,
+        contents=prompt
+    )
+    # text is None when the response was blocked or has no text parts
+    if response.text is None:
+        raise ValueError("Gemini returned no text")
+    return response.text.strip()
+
+
+async def gemini_batch(client, prompts):
+    """Send all prompts concurrently; failed prompts come back as exceptions"""
+    return await asyncio.gather(
+        *[gemini_call(client, p) for p in prompts],
+        return_exceptions=True
+    )
@@ -0,0 +1,98 @@
+"""Pieces shared by the web app and the scripts.
+
+Kept free of import-time side effects (no database, caches, threads or
+logging setup) so scripts can use them without starting the app.
+"""
+import os
+import re
+import threading
+
+import orjson
+
+# Load environment variables from .env file, unless they are already set
+if not os.getenv("GEMINI_API_KEY"):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# --------------------------
+# Gemini client
+# --------------------------
+api_key = os.getenv("GEMINI_API_KEY")
+if api_key == "your_api_key_here":
+    api_key = None  # Placeholder from the example .env; AI features stay disabled
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Gemini client, or None if no API key is set.
+
+    google.genai is imported on first use: it is slow to import and most
+    routes never call Gemini.
+    """
+    global _client
+    # Locked so concurrent first requests don't each build a client
+    if _client is None and api_key:
+        with _client_lock:
+            if _client is None:
+                from google import genai
+                _client = genai.Client(api_key=api_key)
+    return _client
+
+# --------------------------
+# Pre-written questions (added some common ones)
+# --------------------------
+questions = {
+    "Math": {
+        "What is 2+2?": "2+2 = 4",
+        "What is 10-3?": "10-3 = 7",
+        "What is correlation?": "Correlation measures the relationship between two variables."
+    },
+    "Science": {
+        "What is H2O?": "H2O is water",
+        "Which planet is nearest to the sun?": "Mercury",
+        "What is Ohm's law?": "Ohm's law states that V = IR, where V is voltage, I is current, and R is resistance."
+    },
+    "English": {
+        "Synonym of happy?": "Joyful",
+        "Antonym of fast?": "Slow"
+    },
+    "Electronics": {
+        "What does LED stand for?": "Light Emitting Diode",
+        "What is the unit of electric current?": "Ampere"
+    }
+}
+
+# --------------------------
+# AI output parsing
+# --------------------------
+# Escape pairs are matched as a unit so an escaped quote never toggles
+# the in-string state; everything else is skipped by the regex engine.
+_JSON_TOKENS = re.compile(r'\\.|["\[\]]', re.S)
+
+def extract_json_array(text):
+    """Parse the first balanced top-level JSON array found in AI output"""
+    depth = 0
+    in_string = False
+    start = None
+    for m in _JSON_TOKENS.finditer(text):
+        token = m.group()
+        if token[0] == "\\":
+            continue
+        if token == '"':
+            if start is not None:
+                in_string = not in_string
+        elif in_string:
+            continue
+        elif token == "[":
+            if start is None:
+                start = m.start()
+            depth += 1
+        elif start is not None:
+            depth -= 1
+            if depth == 0:
+                try:
+                    return orjson.loads(text[start:m.end()])
+                except orjson.JSONDecodeError:
+                    start = None  # bracketed prose, keep scanning
+    raise ValueError("No JSON array found in AI output")
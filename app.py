@@ -1,43 +1,77 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify
-from google import genai
-import json
+from flask import Flask, Response, make_response, render_template, request, redirect, url_for, jsonify, stream_with_context
+import atexit
+from functools import lru_cache, wraps
+from types import MappingProxyType
+from typing import NamedTuple
+import hashlib
+import jinja2
+import logging
+import logging.handlers
 import os
+import queue
+import re
+import threading
 from urllib.parse import quote, unquote
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from datetime import date
+import fastjsonschema
+import msgspec
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import OSA
 
-# Load environment variables from .env file
-load_dotenv()
+import ai_async
+import db
+from ai_common import api_key, extract_json_array, get_client, questions
+from sem_cache import SemanticCache
+
+# --------------------------
+# Logging
+# --------------------------
+# Request threads only put records on a queue; a listener thread does the
+# actual (blocking) writes to stderr
+log_queue = queue.Queue(-1)
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = logging.handlers.QueueListener(log_queue, log_handler)
+queue_handler = logging.handlers.QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter("%(message)s"))  # full format is applied by log_handler
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+log_listener.start()
+atexit.register(log_listener.stop)
+
+log = logging.getLogger("study_buddy")
 
 app = Flask(__name__, template_folder="templates")
 
+# Compiled templates are cached on disk so new workers skip re-parsing them
+os.makedirs(".jinja_cache", exist_ok=True)
+app.jinja_env.bytecode_cache = jinja2.FileSystemBytecodeCache(".jinja_cache")
+if not app.debug:
+    app.jinja_env.auto_reload = False
+
 # ===== CREATE FLASK APP WITH EXPLICIT PATHS =====
 
 # --------------------------
-# Initialize Gemini client
+# Gemini client
 # --------------------------
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key or api_key == "your_api_key_here":
-    print("⚠️  WARNING: GEMINI_API_KEY not set in .env file!")
-    print("   Get your API key from: https://makersuite.google.com/app/apikey")
-    print("   Add it to the .env file")
-    client = None  # Allow app to run but AI features will be disabled
-else:
-    client = genai.Client(api_key=api_key)
-
-    client = genai.Client(api_key=api_key)
+if not api_key:
+    log.warning(
+        "GEMINI_API_KEY not set in .env file! AI features are disabled. "
+        "Get your API key from https://makersuite.google.com/app/apikey and add it to the .env file"
+    )  # App still runs, AI features are disabled
 
 # --------------------------
-# Study Schedule Data
+# Database (study schedules + AI cache)
 # --------------------------
-if os.path.exists("study_schedules.json"):
-    with open("study_schedules.json", "r") as f:
-        study_schedules = json.load(f)
-else:
-    study_schedules = []
+db.init_db(app)
 
 # Exam presets with suggested subjects and duration
-EXAM_PRESETS = {
+class ExamPreset(NamedTuple):
+    name: str
+    subjects: tuple[str, ...]
+    duration_weeks: int
+    description: str
+
+_RAW_EXAM_PRESETS = {
     "GATE": {
         "name": "GATE (Graduate Aptitude Test in Engineering)",
         "subjects": ["Engineering Mathematics", "General Aptitude", "Technical Subject", "Data Structures", "Algorithms"],
@@ -76,98 +110,223 @@ EXAM_PRESETS = {
     }
 }
 
+# Read-only, so it can be shared across threads and templates without copies
+EXAM_PRESETS = MappingProxyType({
+    key: ExamPreset(**{**preset, "subjects": tuple(preset["subjects"])})
+    for key, preset in _RAW_EXAM_PRESETS.items()
+})
+# Plain-dict form for the create page's JavaScript (|tojson)
+EXAM_PRESETS_JSON = {key: preset._asdict() for key, preset in EXAM_PRESETS.items()}
+
 # --------------------------
-# Subjects and pre-written questions (added some common ones)
+# Subjects and pre-written questions (questions live in ai_common)
 # --------------------------
 subjects = ["Math", "Science", "English", "Electronics"]
 
-questions = {
-    "Math": {
-        "What is 2+2?": "2+2 = 4",
-        "What is 10-3?": "10-3 = 7",
-        "What is correlation?": "Correlation measures the relationship between two variables."
-    },
-    "Science": {
-        "What is H2O?": "H2O is water",
-        "Which planet is nearest to the sun?": "Mercury",
-        "What is Ohm's law?": "Ohm's law states that V = IR, where V is voltage, I is current, and R is resistance."
-    },
-    "English": {
-        "Synonym of happy?": "Joyful",
-        "Antonym of fast?": "Slow"
-    },
-    "Electronics": {
-        "What does LED stand for?": "Light Emitting Diode",
-        "What is the unit of electric current?": "Ampere"
-    }
+# Lowercased, punctuation-stripped keys so "what is h2o" finds "What is H2O?".
+# Math operators are kept so "2+2" and "2-2" stay different questions.
+_NON_QUESTION_CHARS = re.compile(r"[^\w+\-*/=^%]+")
+_MATH_TOKENS = re.compile(r"\d+|[+\-*/=^%]")
+
+def normalize_question(text):
+    return _NON_QUESTION_CHARS.sub(" ", text.lower()).strip()
+
+def _max_typos(word):
+    """Edits a word may have and still count as a typo; a swapped pair is one edit"""
+    return 0 if len(word) < 3 else 1 if len(word) < 8 else 2
+
+def _is_typo_of(query, known):
+    """True if normalized query differs from known only by small per-word typos"""
+    # A different number or operator is a different question
+    if _MATH_TOKENS.findall(query) != _MATH_TOKENS.findall(known):
+        return False
+    query_words, known_words = query.split(), known.split()
+    if len(query_words) != len(known_words):
+        return False
+    return all(
+        OSA.distance(q, k, score_cutoff=_max_typos(k)) <= _max_typos(k)
+        for q, k in zip(query_words, known_words)
+    )
+
+normalized_questions = {
+    sub: {normalize_question(q): a for q, a in qs.items()}
+    for sub, qs in questions.items()
 }
 
 # --------------------------
 # AI Cache
 # --------------------------
-if os.path.exists("ai_cache.json"):
-    with open("ai_cache.json", "r") as f:
-        ai_cache = json.load(f)
-else:
-    ai_cache = {}
+# The dict is this process's view of the ai_cache table; new answers are
+# written to SQLite by a background thread so the request never waits on disk.
+conn = db.connect()
+ai_cache = db.load_ai_cache(conn)
+conn.close()
+
+# Near-duplicate questions ("Explain Ohms law" vs "What is Ohm's law?")
+# are answered from the semantic cache instead of a new Gemini call
+sem_cache = SemanticCache()
+if not sem_cache.enabled:
+    log.info("Semantic cache disabled (install sentence-transformers)")
+
+# Guards ai_cache: under gevent/threads several requests may fill it at once
+ai_cache_lock = threading.Lock()
+cache_queue = queue.Queue()
+
+def cache_answer(question, ans):
+    """Remember a generated answer and queue it for the database"""
+    with ai_cache_lock:
+        ai_cache[question] = ans
+    cache_queue.put((question, ans))
+
+def cache_writer():
+    """Background thread that persists new cache entries"""
+    conn = db.connect()
+    while True:
+        question, ans = cache_queue.get()
+        try:
+            db.save_ai_answer(conn, question, ans)
+            sem_cache.add(question, ans)
+            if cache_queue.empty():
+                sem_cache.save()
+        except Exception:
+            log.exception("AI cache update failed for %r", question)
+
+threading.Thread(target=cache_writer, name="ai-cache-writer", daemon=True).start()
+
+def warm_sem_cache():
+    """Background thread that loads the embedding model; lookups skip the
+    semantic cache until it is done"""
+    try:
+        sem_cache.warm()
+    except Exception:
+        log.exception("Semantic cache model failed to load; semantic cache disabled")
+
+if sem_cache.enabled:
+    threading.Thread(target=warm_sem_cache, name="sem-cache-warm", daemon=True).start()
 
 # --------------------------
 # Helper to get answer with subject-aware prompt and logging
 # --------------------------
 
-def get_answer(sub, question):
-    # Check if AI is available
-    if client is None:
-        return "AI features are currently unavailable. Please set your GEMINI_API_KEY in the .env file."
-    
-    # 1. Check pre-written questions
+AI_UNAVAILABLE = "AI features are currently unavailable. Please set your GEMINI_API_KEY in the .env file."
+
+def _lookup_answer(sub, question):
+    """Answer from pre-written questions or the caches, without calling Gemini"""
+    # 1. Check pre-written questions: exact, normalized, then fuzzy match
     ans = questions.get(sub, {}).get(question)
     if ans:
         return ans
-
-    # 2. Check cache
+    sub_questions = normalized_questions.get(sub)
+    if sub_questions:
+        nq = normalize_question(question)
+        ans = sub_questions.get(nq)
+        if ans:
+            return ans
+        # A typo is fine; a different word, number or operator is not
+        candidates = [q for q in sub_questions if _is_typo_of(nq, q)]
+        match = process.extractOne(nq, candidates, scorer=fuzz.ratio)
+        if match:
+            return sub_questions[match[0]]
+
+    # 2. Check cache (another worker may have stored it in the database)
     if question in ai_cache:
         return ai_cache[question]
+    ans = db.get_ai_answer(db.get_db(), question)
+    if ans is not None:
+        with ai_cache_lock:
+            ai_cache[question] = ans
+        return ans
+
+    # 3. Check semantic cache for a near-duplicate question
+    try:
+        return sem_cache.lookup(question)
+    except Exception:
+        log.exception("Semantic cache lookup failed for %r", question)
+        return None
+
+def _answer_prompt(sub, question):
+    return f"Answer this question in simple terms for a student in {sub}: {question}"
+
+def get_answer(sub, question):
+    # Check if AI is available
+    client = get_client()
+    if client is None:
+        return AI_UNAVAILABLE
+
+    ans = _lookup_answer(sub, question)
+    if ans:
+        return ans
 
-    # 3. Generate AI answer
+    # 4. Generate AI answer
     try:
-        prompt = f"Answer this question in simple terms for a student in {sub}: {question}"
         response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
+            model=ai_async.MODEL,
+            contents=_answer_prompt(sub, question)
         )
         ans = response.text.strip()
-        print(f"AI output for '{question}': {ans}")  # Debug log
+        log.debug("AI output for %r: %s", question, ans)
 
         # Save in cache
-        ai_cache[question] = ans
-        with open("ai_cache.json", "w") as f:
-            json.dump(ai_cache, f)
+        cache_answer(question, ans)
 
         return ans if ans else "Sorry, AI could not generate an answer."
 
-    except Exception as e:
-        print(f"AI generation failed for '{question}': {e}")
+    except Exception:
+        log.exception("AI generation failed for %r", question)
         return "Sorry, the answer could not be generated."
 
+def get_answer_stream(sub, question):
+    """Like get_answer, but yields the AI answer in pieces as they arrive"""
+    client = get_client()
+    if client is None:
+        yield AI_UNAVAILABLE
+        return
+
+    ans = _lookup_answer(sub, question)
+    if ans:
+        yield ans
+        return
+
+    try:
+        pieces = []
+        for chunk in client.models.generate_content_stream(
+            model=ai_async.MODEL,
+            contents=_answer_prompt(sub, question)
+        ):
+            if chunk.text:
+                pieces.append(chunk.text)
+                yield chunk.text
+        ans = "".join(pieces).strip()
+        log.debug("AI output for %r: %s", question, ans)
+
+        # Cache only the complete answer, once the stream has finished
+        cache_answer(question, ans)
+
+        if not ans:
+            yield "Sorry, AI could not generate an answer."
+
+    except Exception:
+        log.exception("AI generation failed for %r", question)
+        yield "Sorry, the answer could not be generated."
+
+def sse_format(chunks):
+    """Wrap text chunks as Server-Sent Events, ending with a 'done' event"""
+    for chunk in chunks:
+        yield "".join(f"data: {line}\n" for line in chunk.split("\n")) + "\n"
+    yield "event: done\ndata: \n\n"
+
 # --------------------------
 # Study Schedule Helper Functions
 # --------------------------
-def save_schedules():
-    """Save study schedules to JSON file"""
-    with open("study_schedules.json", "w") as f:
-        json.dump(study_schedules, f, indent=2)
-
-def generate_ai_study_plan(exam_type, subjects, weeks, hours_per_day=4):
-    """Generate AI-powered study plan"""
-    if client is None:
-        return None
-    
-    try:
-        prompt = f"""
-Create a detailed {weeks}-week study schedule for {exam_type} exam preparation.
-Subjects to cover: {', '.join(subjects)}
-Study hours per day: {hours_per_day}
+# Prompt templates are split into constant parts around the few variable
+# slots and joined per call, instead of re-formatting a large f-string.
+_STUDY_PLAN_PROMPT_PARTS = (
+    "\nCreate a detailed ",
+    "-week study schedule for ",
+    """ exam preparation.
+Subjects to cover: """,
+    "\nStudy hours per day: ",
+    """
 
 Provide a week-by-week breakdown with:
 - Topics to cover each week
@@ -177,50 +336,64 @@ Provide a week-by-week breakdown with:
 
 Format as JSON array with weekly plans:
 [
-  {{
+  {
     "week": 1,
     "focus": "Foundation Building",
-    "daily_schedule": {{
-      "Monday": {{"subject": "Subject 1", "topics": ["Topic A", "Topic B"], "hours": 4}},
-      "Tuesday": {{"subject": "Subject 2", "topics": ["Topic C"], "hours": 4}}
-    }}
-  }}
+    "daily_schedule": {
+      "Monday": {"subject": "Subject 1", "topics": ["Topic A", "Topic B"], "hours": 4},
+      "Tuesday": {"subject": "Subject 2", "topics": ["Topic C"], "hours": 4}
+    }
+  }
 ]
-"""
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
-        )
-        
-        text = response.text.strip()
-        start = text.find("[")
-        end = text.rfind("]") + 1
-        if start != -1 and end > 0:
-            return json.loads(text[start:end])
+""",
+)
+
+def _render_study_plan_prompt(exam_type, subjects, weeks, hours_per_day):
+    p = _STUDY_PLAN_PROMPT_PARTS
+    return "".join((
+        p[0], str(weeks), p[1], str(exam_type), p[2], ", ".join(subjects), p[3], str(hours_per_day), p[4]
+    ))
+
+async def generate_ai_study_plan(exam_type, subjects, weeks, hours_per_day=4):
+    """Generate AI-powered study plan"""
+    client = get_client()
+    if client is None:
         return None
-    except Exception as e:
-        print(f"AI study plan generation failed: {e}")
+    
+    try:
+        prompt = _render_study_plan_prompt(exam_type, subjects, weeks, hours_per_day)
+        text = await ai_async.gemini_call(client, prompt)
+        return extract_json_array(text)
+    except Exception:
+        log.exception("AI study plan generation failed")
         return None
 
 # --------------------------
 # AI MCQs
-def generate_ai_mcqs(subject, num_questions=5, difficulty="medium"):
-    if client is None:
-        # Return fallback questions if AI is not available
-        return [
-            {
-                "question": f"Sample {subject} question {i + 1}?",
-                "options": ["Option A", "Option B", "Option C", "Option D"],
-                "answer": "Option A"
-            }
-            for i in range(num_questions)
-        ]
-    
-    prompt = f"""
+class MCQ(msgspec.Struct):
+    question: str
+    options: list[str]
+    answer: str
+
+def _fallback_mcqs(subject, num_questions):
+    return [
+        MCQ(
+            question=f"Sample {subject} question {i + 1}?",
+            options=["Option A", "Option B", "Option C", "Option D"],
+            answer="Option A"
+        )
+        for i in range(num_questions)
+    ]
+
+_MCQ_PROMPT_PARTS = (
+    """
 You are an expert exam question setter.
 
-Generate {num_questions} {difficulty} difficulty multiple-choice questions
-for a Level 3 quiz on the subject: {subject}.
+Generate """,
+    " ",
+    """ difficulty multiple-choice questions
+for a Level 3 quiz on the subject: """,
+    """.
 
 STRICT RULES:
 - EXACTLY 4 options per question
@@ -231,74 +404,195 @@ STRICT RULES:
 
 JSON format:
 [
-  {{
+  {
     "question": "Question text",
     "options": ["Option A", "Option B", "Option C", "Option D"],
     "answer": "Option A"
-  }}
+  }
 ]
-"""
+""",
+)
+
+def _render_mcq_prompt(subject, num_questions, difficulty):
+    p = _MCQ_PROMPT_PARTS
+    return "".join((p[0], str(num_questions), p[1], difficulty, p[2], subject, p[3]))
+
+# Shape of AI-generated MCQs, compiled once into specialized validators
+MCQ_SCHEMA = {
+    "type": "object",
+    "required": ["question", "options", "answer"],
+    "properties": {
+        "question": {"type": "string"},
+        "options": {"type": "array", "items": {"type": "string"}, "minItems": 4, "maxItems": 4},
+        "answer": {"type": "string"}
+    }
+}
+MCQ_LIST_SCHEMA = {"type": "array", "items": MCQ_SCHEMA}
 
+_validate_mcq = fastjsonschema.compile(MCQ_SCHEMA)
+_validate_mcq_list = fastjsonschema.compile(MCQ_LIST_SCHEMA)
+
+def _is_valid_mcq(q):
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
-        )
+        _validate_mcq(q)
+        return True
+    except fastjsonschema.JsonSchemaException:
+        return False
+
+def _parse_mcqs(text):
+    # --- Safe JSON extraction ---
+    mcqs = extract_json_array(text)
+
+    # --- Validation ---
+    # Fast path checks the whole list at once; only a list with bad
+    # entries is filtered question by question
+    try:
+        _validate_mcq_list(mcqs)
+    except fastjsonschema.JsonSchemaException:
+        mcqs = [q for q in mcqs if _is_valid_mcq(q)]
+    validated_mcqs = [
+        MCQ(question=q["question"], options=q["options"], answer=q["answer"])
+        for q in mcqs
+        if q["answer"] in q["options"]
+    ]
+
+    if not validated_mcqs:
+        raise ValueError("All MCQs failed validation")
+
+    return validated_mcqs
+
+async def generate_ai_mcqs_batch(subjects, num_questions=5, difficulty="medium"):
+    """Generate one quiz per subject with all Gemini calls in flight at once.
+
+    Subjects whose quiz could not be generated get None.
+    """
+    client = get_client()
+    if client is None:
+        return [None] * len(subjects)
+
+    prompts = [_render_mcq_prompt(subject, num_questions, difficulty) for subject in subjects]
+    results = await ai_async.gemini_batch(client, prompts)
+
+    quizzes = []
+    for subject, result in zip(subjects, results):
+        try:
+            if isinstance(result, Exception):
+                raise result
+            quizzes.append(_parse_mcqs(result))
+        except Exception:
+            log.exception("AI MCQs generation failed for %s", subject)
+            quizzes.append(None)
+    return quizzes
+
+def generate_ai_mcqs(subject, num_questions=5, difficulty="medium"):
+    mcqs = ai_async.run(generate_ai_mcqs_batch([subject], num_questions, difficulty))[0]
+    # --- Guaranteed fallback (never crashes demo) ---
+    return mcqs or _fallback_mcqs(subject, num_questions)
+
+# --------------------------
+# Quiz prefetch
+# --------------------------
+# Opening a schedule starts generating one quiz per subject in the
+# background, so following a quiz link from that schedule is instant.
+quiz_prefetch_cache = {}   # (schedule_id, subject) -> mcqs
+quiz_prefetching = set()   # schedule ids with a prefetch in flight
+quiz_prefetch_lock = threading.Lock()
+
+def prefetch_quizzes(schedule_id, subjects):
+    with quiz_prefetch_lock:
+        if schedule_id in quiz_prefetching:
+            return
+        missing = [s for s in subjects if (schedule_id, s) not in quiz_prefetch_cache]
+        if not missing:
+            return
+        quiz_prefetching.add(schedule_id)
+
+    def store(future):
+        with quiz_prefetch_lock:
+            quiz_prefetching.discard(schedule_id)
+            if future.exception() is None:
+                for subject, mcqs in zip(missing, future.result()):
+                    # Failed subjects are left out so the quiz page tries again
+                    if mcqs:
+                        quiz_prefetch_cache[(schedule_id, subject)] = mcqs
+
+    ai_async.submit(generate_ai_mcqs_batch(missing)).add_done_callback(store)
+
+def take_prefetched_quiz(schedule_id, subject):
+    """Prefetched quiz for this schedule and subject (used once), or None"""
+    with quiz_prefetch_lock:
+        return quiz_prefetch_cache.pop((schedule_id, subject), None)
+
+def drop_prefetched_quizzes(schedule_id):
+    with quiz_prefetch_lock:
+        for key in [k for k in quiz_prefetch_cache if k[0] == schedule_id]:
+            del quiz_prefetch_cache[key]
 
-        text = response.text.strip()
-
-        # --- Safe JSON extraction ---
-        start = text.find("[")
-        end = text.rfind("]") + 1
-        if start == -1 or end == 0:
-            raise ValueError("No JSON array found in AI output")
-
-        mcqs = json.loads(text[start:end])
-
-        # --- Validation ---
-        validated_mcqs = []
-        for q in mcqs:
-            if (
-                isinstance(q, dict)
-                and "question" in q
-                and "options" in q
-                and "answer" in q
-                and isinstance(q["options"], list)
-                and len(q["options"]) == 4
-                and q["answer"] in q["options"]
-            ):
-                validated_mcqs.append(q)
-
-        if not validated_mcqs:
-            raise ValueError("All MCQs failed validation")
-
-        return validated_mcqs
-
-    except Exception as e:
-        print("AI MCQs generation failed:", e)
-
-        # --- Guaranteed fallback (never crashes demo) ---
-        return [
-            {
-                "question": f"Sample {subject} question {i + 1}?",
-                "options": ["Option A", "Option B", "Option C", "Option D"],
-                "answer": "Option A"
-            }
-            for i in range(num_questions)
-        ]
 # --------------------------
 # Routes
 # --------------------------
 
+@app.context_processor
+def inject_globals():
+    """Static data every template can use without passing it explicitly"""
+    return {"subjects": subjects, "exam_presets": EXAM_PRESETS, "exam_presets_json": EXAM_PRESETS_JSON}
+
+# --------------------------
+# HTTP caching
+# --------------------------
+STATIC_PAGE_CACHE_CONTROL = "public, max-age=300"
+
+def _etag(data):
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+# Changes whenever a deploy changes any template, so ETags built from
+# database state alone can't outlive a new page layout
+def _templates_version():
+    digest = hashlib.blake2b(digest_size=8)
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    for name in sorted(os.listdir(template_dir)):
+        with open(os.path.join(template_dir, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+TEMPLATES_VERSION = _templates_version()
+
+def conditional_response(etag, render, cache_control):
+    """304 if the client already has this ETag, otherwise render the page"""
+    if request.if_none_match.contains(etag):
+        resp = make_response("", 304)
+    else:
+        resp = make_response(render())
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    return resp
+
+def static_page(view):
+    """For pages built only from constants: render once per process, then
+    serve them with an ETag and a public Cache-Control header"""
+    @lru_cache(maxsize=128)
+    def render(**kwargs):
+        html = view(**kwargs)
+        return html, _etag(html.encode("utf-8"))
+
+    @wraps(view)
+    def wrapper(**kwargs):
+        html, etag = render(**kwargs)
+        return conditional_response(etag, lambda: html, STATIC_PAGE_CACHE_CONTROL)
+    return wrapper
+
 @app.route("/")
+@static_page
 def home():
-    return render_template("home.html", subjects=subjects)
+    return render_template("home.html")
 
 @app.route("/subject/<sub>")
+@static_page
 def subject_page(sub):
     return render_template("subject_page1.html", subject=sub)
 
 @app.route("/subject/<sub>/questions")
+@static_page
 def view_questions(sub):
     sub_questions = questions.get(sub, {})
     return render_template(
@@ -309,14 +603,17 @@ def view_questions(sub):
 @app.route("/ai")
 def ask_ai():
     try:
+        client = get_client()
         if client is None:
             return "<h2>Gemini API not configured. AI features unavailable.</h2>"
         # Example AI call
-        response = client.generate_text(prompt="Hello from Smart Study Buddy!")
+        response = client.models.generate_content(
+            model=ai_async.MODEL,
+            contents="Hello from Smart Study Buddy!"
+        )
         return f"<h2>AI Response:</h2><p>{response.text}</p>"
-    except Exception as e:
-        # Log error
-        print("ERROR in /ai route:", e)
+    except Exception:
+        log.exception("Error in /ai route")
         return "<h2>Internal Server Error in AI route</h2>"
 @app.route("/subject/<sub>/ask", methods=["GET","POST"])
 def ask_ai2(sub):
@@ -334,6 +631,14 @@ def ask_ai2(sub):
         answer=answer
     )
 
+@app.route("/subject/<sub>/ask/stream")
+def ask_ai_stream(sub):
+    question = request.args.get("question", "")
+    return Response(
+        stream_with_context(sse_format(get_answer_stream(sub, question))),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.route("/subject/<sub>/<question>")
 def direct_question(sub, question):
@@ -346,20 +651,25 @@ def ai_quiz(sub):
     if request.method == "POST":
         mcqs_json = request.form.get("mcqs_json","[]")
         try:
-            mcqs = json.loads(mcqs_json)
-        except:
+            mcqs = msgspec.json.decode(mcqs_json, type=list[MCQ])
+        except msgspec.DecodeError:
             mcqs = []
 
         score = 0
         for i, q in enumerate(mcqs):
             selected = request.form.get(f"q{i}")
-            if selected == q.get("answer"):
+            if selected == q.answer:
                 score += 1
 
         return render_template("quiz_result.html", subject=sub, score=score, total=len(mcqs))
 
-    mcqs = generate_ai_mcqs(sub, num_questions=5)
-    return render_template("quiz.html", subject=sub, mcqs=mcqs, mcqs_json=json.dumps(mcqs))
+    mcqs = None
+    schedule_id = request.args.get("schedule", type=int)
+    if schedule_id is not None:
+        mcqs = take_prefetched_quiz(schedule_id, sub)
+    if mcqs is None:
+        mcqs = generate_ai_mcqs(sub, num_questions=5)
+    return render_template("quiz.html", subject=sub, mcqs=mcqs, mcqs_json=msgspec.json.encode(mcqs).decode())
 
 # --------------------------
 # Study Schedule Routes
@@ -368,9 +678,14 @@ def ai_quiz(sub):
 @app.route("/study-schedule")
 def study_schedule_home():
     """Main study schedule page"""
-    return render_template("study_schedule.html", 
-                         schedules=study_schedules, 
-                         exam_presets=EXAM_PRESETS)
+    conn = db.get_db()
+    # The list changes on every create/delete, so clients must revalidate
+    etag = f"{TEMPLATES_VERSION}-{db.schedules_version(conn)}"
+    return conditional_response(
+        etag,
+        lambda: render_template("study_schedule.html", schedules=db.list_schedules(conn)),
+        "no-cache"
+    )
 
 @app.route("/study-schedule/create", methods=["GET", "POST"])
 def create_schedule():
@@ -385,64 +700,79 @@ def create_schedule():
         # Get preset or use custom
         if exam_type in EXAM_PRESETS and exam_type != "Custom":
             preset = EXAM_PRESETS[exam_type]
-            schedule_name = preset["name"]
+            schedule_name = preset.name
             if not subjects:
-                subjects = preset["subjects"]
+                subjects = list(preset.subjects)
         else:
             schedule_name = custom_name or "Custom Study Plan"
         
+        today = date.today()
+        try:
+            start = date.fromisoformat(request.form.get("start_date") or "")
+        except ValueError:
+            start = today  # Missing or malformed date (e.g. 2026-13-01)
+
         # Create schedule
-        schedule = {
-            "id": len(study_schedules) + 1,
-            "name": schedule_name,
-            "exam_type": exam_type,
-            "subjects": subjects,
-            "weeks": weeks,
-            "hours_per_day": hours_per_day,
-            "created_date": datetime.now().strftime("%Y-%m-%d"),
-            "start_date": request.form.get("start_date", datetime.now().strftime("%Y-%m-%d")),
-            "status": "active"
-        }
+        schedule = db.Schedule(
+            name=schedule_name,
+            exam_type=exam_type,
+            subjects=subjects,
+            weeks=weeks,
+            hours_per_day=hours_per_day,
+            created_date=today.isoformat(),
+            start_date=start.isoformat(),
+            start_ordinal=start.toordinal(),
+            status="active"
+        )
         
-        # Try to generate AI study plan
-        ai_plan = generate_ai_study_plan(exam_type, subjects, weeks, hours_per_day)
+        # Generate the AI study plan while the schedule is being saved
+        plan_future = ai_async.submit(
+            generate_ai_study_plan(exam_type, subjects, weeks, hours_per_day)
+        )
+        conn = db.get_db()
+        db.save_schedule(conn, schedule)
+
+        ai_plan = plan_future.result()
         if ai_plan:
-            schedule["ai_plan"] = ai_plan
-        
-        study_schedules.append(schedule)
-        save_schedules()
+            schedule.ai_plan = ai_plan
+            db.save_schedule(conn, schedule)
         
-        return redirect(url_for("view_schedule", schedule_id=schedule["id"]))
+        return redirect(url_for("view_schedule", schedule_id=schedule.id))
     
     # Pass today's date to the template
-    today = datetime.now().strftime("%Y-%m-%d")
-    return render_template("create_schedule.html", exam_presets=EXAM_PRESETS, today=today)
+    today = date.today().isoformat()
+    return render_template("create_schedule.html", today=today)
 
 @app.route("/study-schedule/<int:schedule_id>")
 def view_schedule(schedule_id):
     """View a specific study schedule"""
-    schedule = next((s for s in study_schedules if s["id"] == schedule_id), None)
+    conn = db.get_db()
+    schedule = db.get_schedule(conn, schedule_id)
     if not schedule:
         return "Schedule not found", 404
+
+    # Schedules created before start_ordinal existed get it filled in once
+    if schedule.start_ordinal is None:
+        schedule.start_ordinal = date.fromisoformat(schedule.start_date).toordinal()
+        db.save_schedule(conn, schedule)
     
     # Calculate progress
-    start_date = datetime.strptime(schedule["start_date"], "%Y-%m-%d")
-    current_date = datetime.now()
-    days_elapsed = (current_date - start_date).days
-    current_week = min(days_elapsed // 7 + 1, schedule["weeks"])
-    progress = min((current_week / schedule["weeks"]) * 100, 100)
-    
-    schedule["current_week"] = current_week
-    schedule["progress"] = round(progress, 1)
+    days_elapsed = date.today().toordinal() - schedule.start_ordinal
+    current_week = min(days_elapsed // 7 + 1, schedule.weeks)
+    progress = min((current_week / schedule.weeks) * 100, 100)
+
+    prefetch_quizzes(schedule_id, schedule.subjects)
     
-    return render_template("view_schedule.html", schedule=schedule)
+    return render_template("view_schedule.html",
+                           schedule=schedule,
+                           current_week=current_week,
+                           progress=round(progress, 1))
 
 @app.route("/study-schedule/<int:schedule_id>/delete", methods=["POST"])
 def delete_schedule(schedule_id):
     """Delete a study schedule"""
-    global study_schedules
-    study_schedules = [s for s in study_schedules if s["id"] != schedule_id]
-    save_schedules()
+    db.delete_schedule(db.get_db(), schedule_id)
+    drop_prefetched_quizzes(schedule_id)
     return redirect(url_for("study_schedule_home"))
 
 @app.errorhandler(404)
@@ -460,6 +790,18 @@ def internal_error(e):
 # --------------------------
 # Run app
 # --------------------------
+# Development server only. In production run under Gunicorn with gevent
+# workers so requests waiting on Gemini don't block each other:
+#
+#   gunicorn -k gevent -w 2 --worker-connections 200 app:app
+#
+# The gevent worker monkey-patches sockets and threading, so the Gemini
+# client, the cache writer thread and the async loop in ai_async yield
+# while waiting on I/O. Threads become greenlets, though, so CPU-bound
+# work does not yield: the semantic cache runs its model load and
+# encode() on gevent's pool of real OS threads (see sem_cache._blocking).
+# Don't install trio alongside gevent: httpx picks it up if present, and
+# it needs select.epoll, which gevent removes.
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
\ No newline at end of file
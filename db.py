@@ -0,0 +1,211 @@
+import json
+import os
+import sqlite3
+from typing import Optional
+
+import msgspec
+from flask import g
+
+DB_PATH = "study_buddy.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    exam_type TEXT,
+    subjects_json TEXT NOT NULL,
+    weeks INTEGER NOT NULL,
+    hours_per_day INTEGER NOT NULL,
+    created_date TEXT,
+    start_date TEXT,
+    status TEXT,
+    ai_plan_json TEXT,
+    start_ordinal INTEGER
+);
+CREATE TABLE IF NOT EXISTS ai_cache (
+    question TEXT PRIMARY KEY,
+    answer TEXT
+);
+"""
+
+
+class Schedule(msgspec.Struct):
+    name: str
+    exam_type: Optional[str]
+    subjects: list[str]
+    weeks: int
+    hours_per_day: int
+    created_date: Optional[str]
+    start_date: str
+    status: Optional[str]
+    ai_plan: Optional[list] = None
+    id: Optional[int] = None
+    start_ordinal: Optional[int] = None
+
+
+def connect():
+    """Open a new connection; callers outside a request own and close it"""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def get_db():
+    """Connection for the current request, opened on first use"""
+    if "db" not in g:
+        g.db = connect()
+    return g.db
+
+
+def close_db(e=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        conn.close()
+
+
+def init_db(app):
+    """Create tables, import the old JSON files once, and register teardown"""
+    conn = connect()
+    conn.executescript(SCHEMA)
+    _add_missing_columns(conn)
+    _import_legacy_json(conn)
+    conn.commit()
+    conn.close()
+    app.teardown_appcontext(close_db)
+
+
+def _add_missing_columns(conn):
+    # Databases created before start_ordinal was added to the schema
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(schedules)")}
+    if "start_ordinal" not in columns:
+        conn.execute("ALTER TABLE schedules ADD COLUMN start_ordinal INTEGER")
+
+
+def _import_legacy_json(conn):
+    # Data from before the SQLite migration, imported once per database
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+        return
+
+    if os.path.exists("study_schedules.json"):
+        with open("study_schedules.json", "rb") as f:
+            schedules = msgspec.json.decode(f.read(), type=list[Schedule])
+        # The JSON app numbered schedules len(list) + 1, so a delete followed
+        # by a create reused ids. Unique ids are kept; copies get new ones.
+        seen = set()
+        for schedule in schedules:
+            if schedule.id in seen:
+                schedule.id = None
+            seen.add(schedule.id)
+        # Rows with their own id go first so a new id never takes one of them
+        schedules.sort(key=lambda s: s.id is None)
+        conn.executemany(
+            "INSERT INTO schedules VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [_schedule_params(schedule) for schedule in schedules]
+        )
+
+    entries = {}
+    if os.path.exists("ai_cache.json"):
+        with open("ai_cache.json", "r") as f:
+            entries.update(json.load(f))
+    if os.path.exists("ai_cache.log"):
+        with open("ai_cache.log", "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry["q"]] = entry["a"]
+    conn.executemany("INSERT OR REPLACE INTO ai_cache VALUES (?, ?)", entries.items())
+
+    conn.execute("PRAGMA user_version = 1")
+
+
+# --------------------------
+# Schedules
+# --------------------------
+def _schedule_params(schedule):
+    return (
+        schedule.id,
+        schedule.name,
+        schedule.exam_type,
+        msgspec.json.encode(schedule.subjects).decode(),
+        schedule.weeks,
+        schedule.hours_per_day,
+        schedule.created_date,
+        schedule.start_date,
+        schedule.status,
+        msgspec.json.encode(schedule.ai_plan).decode() if schedule.ai_plan else None,
+        schedule.start_ordinal,
+    )
+
+
+def _schedule_from_row(row):
+    return Schedule(
+        id=row["id"],
+        name=row["name"],
+        exam_type=row["exam_type"],
+        subjects=msgspec.json.decode(row["subjects_json"], type=list[str]),
+        weeks=row["weeks"],
+        hours_per_day=row["hours_per_day"],
+        created_date=row["created_date"],
+        start_date=row["start_date"],
+        status=row["status"],
+        ai_plan=msgspec.json.decode(row["ai_plan_json"]) if row["ai_plan_json"] else None,
+        start_ordinal=row["start_ordinal"],
+    )
+
+
+def list_schedules(conn):
+    rows = conn.execute("SELECT * FROM schedules ORDER BY id")
+    return [_schedule_from_row(row) for row in rows]
+
+
+def get_schedule(conn, schedule_id):
+    row = conn.execute("SELECT * FROM schedules WHERE id = ?", (schedule_id,)).fetchone()
+    return _schedule_from_row(row) if row else None
+
+
+def save_schedule(conn, schedule):
+    """Insert or update a schedule; new schedules get their id assigned here"""
+    cur = conn.execute(
+        "INSERT OR REPLACE INTO schedules VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        _schedule_params(schedule)
+    )
+    conn.commit()
+    schedule.id = cur.lastrowid
+    return schedule.id
+
+
+def schedules_version(conn):
+    """Changes whenever a schedule is added or deleted (ids are never reused)"""
+    count, max_id = conn.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM schedules").fetchone()
+    return f"{count}-{max_id}"
+
+
+def delete_schedule(conn, schedule_id):
+    conn.execute("DELETE FROM schedules WHERE id = ?", (schedule_id,))
+    conn.commit()
+
+
+# --------------------------
+# AI Cache
+# --------------------------
+def load_ai_cache(conn):
+    return {row["question"]: row["answer"] for row in conn.execute("SELECT * FROM ai_cache")}
+
+
+def get_ai_answer(conn, question):
+    row = conn.execute("SELECT answer FROM ai_cache WHERE question = ?", (question,)).fetchone()
+    return row["answer"] if row else None
+
+
+def save_ai_answer(conn, question, answer):
+    conn.execute("INSERT OR REPLACE INTO ai_cache VALUES (?, ?)", (question, answer))
+    conn.commit()
+
+
+def save_ai_answers(conn, answers):
+    """Bulk insert of (question, answer) pairs"""
+    conn.executemany("INSERT OR REPLACE INTO ai_cache VALUES (?, ?)", answers)
+    conn.commit()
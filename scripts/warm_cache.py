@@ -0,0 +1,126 @@
+"""Pre-fill the AI cache with answers to paraphrases of the pre-written questions.
+
+Runs as one Gemini Batch API job (cheaper than live calls, but slow), so
+it belongs in the deploy step rather than the request path:
+
+    make warm-cache
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import ai_async
+import db
+from ai_common import extract_json_array, get_client, questions
+
+PARAPHRASES = 8
+POLL_SECONDS = 30
+DONE_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+
+
+def paraphrase_prompt(sub, question):
+    return f"""
+A student studying {sub} asked: {question}
+
+Write {PARAPHRASES} different ways a student might type this same question,
+then answer each one in simple terms for a student in {sub}.
+
+Output ONLY a JSON array, no markdown:
+[
+  {{"question": "Paraphrased question", "answer": "Answer text"}}
+]
+"""
+
+
+def write_batch_file(path):
+    """One JSONL request per pre-written question"""
+    with open(path, "w") as f:
+        for sub, qs in questions.items():
+            for i, question in enumerate(qs):
+                request = {
+                    "key": f"{sub}-{i}",
+                    "request": {
+                        "contents": [{"role": "user", "parts": [{"text": paraphrase_prompt(sub, question)}]}]
+                    },
+                }
+                f.write(json.dumps(request) + "\n")
+
+
+def run_batch(client, path):
+    uploaded = client.files.upload(
+        file=path,
+        config={"display_name": "study-buddy-warm-cache", "mime_type": "jsonl"}
+    )
+    job = client.batches.create(
+        model=ai_async.MODEL,
+        src=uploaded.name,
+        config={"display_name": "study-buddy-warm-cache"}
+    )
+    while job.state.name not in DONE_STATES:
+        print(f"Batch {job.name}: {job.state.name}")
+        time.sleep(POLL_SECONDS)
+        job = client.batches.get(name=job.name)
+
+    if job.state.name != "JOB_STATE_SUCCEEDED":
+        sys.exit(f"Batch {job.name} finished with {job.state.name}: {job.error}")
+    return client.files.download(file=job.dest.file_name).decode("utf-8")
+
+
+def parse_results(content):
+    """Collect {paraphrased question: answer} from the batch output"""
+    answers = {}
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        if "response" not in result:
+            print(f"Request {result.get('key')} failed: {result.get('error')}")
+            continue
+
+        parts = result["response"]["candidates"][0]["content"]["parts"]
+        text = "".join(part.get("text", "") for part in parts)
+        try:
+            pairs = extract_json_array(text)
+        except ValueError as e:
+            print(f"Request {result.get('key')}: {e}")
+            continue
+
+        for pair in pairs:
+            if not isinstance(pair, dict):
+                continue
+            question, answer = pair.get("question"), pair.get("answer")
+            # Model output: skip anything that isn't a pair of non-empty strings
+            if isinstance(question, str) and isinstance(answer, str) and question.strip() and answer.strip():
+                answers[question.strip()] = answer.strip()
+    return answers
+
+
+def main():
+    client = get_client()
+    if client is None:
+        sys.exit("GEMINI_API_KEY is not set")
+
+    fd, path = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    try:
+        write_batch_file(path)
+        content = run_batch(client, path)
+    finally:
+        os.remove(path)
+
+    answers = parse_results(content)
+    conn = db.connect()
+    db.save_ai_answers(conn, answers.items())
+    conn.close()
+    print(f"Cached {len(answers)} answers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import importlib.util
+import json
+import os
+import sys
+import threading
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Semantic cache is disabled without numpy
+
+# Only checked here: importing sentence_transformers pulls in torch, which
+# takes seconds, so the import happens when the model is first loaded
+HAS_SENTENCE_TRANSFORMERS = importlib.util.find_spec("sentence_transformers") is not None
+
+# Optional search backends: FAISS if installed, otherwise a Numba kernel
+# (compiled by warm()), otherwise a plain numpy matrix-vector product.
+# Both are imported only when the cache is enabled.
+MODEL_NAME = "all-MiniLM-L6-v2"
+DIM = 384
+
+
+def _blocking(fn, *args, **kwargs):
+    """Run CPU-bound fn without stalling the other requests of this worker.
+
+    Under gunicorn's gevent worker, threads are monkey-patched into
+    greenlets, so the model load and encode() would hold up every request
+    in the process; there they run on the gevent hub's pool of real OS
+    threads instead.
+    """
+    if "gevent" in sys.modules:
+        from gevent import get_hub, monkey
+        if monkey.is_module_patched("threading"):
+            return get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
+
+
+def _load_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME)
+
+
+def top1(q, mat):
+    """Index and score of the row of mat with the largest dot product with q"""
+    scores = mat @ q
+    best = int(np.argmax(scores))
+    return best, scores[best]
+
+
+def _compile_numba_top1():
+    """Numba parallel version of top1, already compiled; None without numba.
+
+    numba takes a few hundred ms to import, so this only runs from warm().
+    """
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return None
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def numba_top1(q, mat):
+        # Scores are written per row and reduced afterwards; updating a
+        # shared best score inside prange would race between threads
+        scores = np.empty(mat.shape[0], dtype=np.float32)
+        for i in prange(mat.shape[0]):
+            s = 0.0
+            for k in range(mat.shape[1]):
+                s += q[k] * mat[i, k]
+            scores[i] = s
+        best = np.argmax(scores)
+        return best, scores[best]
+
+    numba_top1(np.zeros(DIM, dtype=np.float32), np.zeros((1, DIM), dtype=np.float32))
+    return numba_top1
+
+
+class SemanticCache:
+    """Cache of AI answers looked up by question meaning instead of exact text"""
+
+    def __init__(self, vectors_path="sem_cache_vectors.npy",
+                 answers_path="sem_cache_answers.json", threshold=0.92):
+        self.vectors_path = vectors_path
+        self.answers_path = answers_path
+        self.threshold = threshold
+        self.enabled = np is not None and HAS_SENTENCE_TRANSFORMERS
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+        self._model = None
+        self._top1 = top1
+        self._entries = []   # [{"q": question, "a": answer}], parallel to the rows
+        self._dirty = False
+        if not self.enabled:
+            return
+
+        # Unit-length embeddings, one row per entry; grown by doubling
+        self._matrix = np.empty((64, DIM), dtype=np.float32)
+        if os.path.exists(self.vectors_path) and os.path.exists(self.answers_path):
+            self._matrix = np.load(self.vectors_path).astype(np.float32)
+            with open(self.answers_path, "r") as f:
+                self._entries = json.load(f)
+
+        self._index = None
+        try:
+            import faiss
+        except ImportError:
+            return
+        self._index = faiss.IndexFlatIP(DIM)
+        self._index.add(self._matrix[:len(self._entries)])
+
+    def warm(self):
+        """Load the embedding model and compile the search kernel.
+
+        Slow (seconds, or minutes if the model must be downloaded), so call
+        it from its own background thread. If the model fails to load the
+        cache is disabled rather than retried on every add().
+        """
+        if not self.enabled:
+            return
+        try:
+            self._get_model()
+        except Exception:
+            self.enabled = False
+            raise
+        if self._index is None:
+            self._top1 = _blocking(_compile_numba_top1) or top1
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = _blocking(_load_model)
+        return self._model
+
+    @lru_cache(maxsize=256)
+    def _encode(self, text):
+        # Embeddings are unit length, so inner product equals cosine similarity
+        vec = _blocking(self._get_model().encode, text, normalize_embeddings=True)
+        return vec.astype(np.float32)
+
+    def lookup(self, question):
+        """Return the answer of the closest cached question, or None"""
+        # Until warm() has loaded the model, requests skip the semantic
+        # cache rather than wait for it
+        if not self.enabled or not self._entries or self._model is None:
+            return None
+        vec = self._encode(question)
+        with self._lock:
+            if self._index is not None:
+                scores, ids = self._index.search(vec[None, :], 1)
+                best, score = ids[0][0], scores[0][0]
+            else:
+                best, score = self._top1(vec, self._matrix[:len(self._entries)])
+            if score >= self.threshold:
+                return self._entries[best]["a"]
+        return None
+
+    def add(self, question, answer):
+        # Answers produced before warm() finishes are only in the exact cache
+        if not self.enabled or self._model is None:
+            return
+        vec = self._encode(question)
+        with self._lock:
+            size = len(self._entries)
+            if size == len(self._matrix):
+                grown = np.empty((max(64, 2 * size), DIM), dtype=np.float32)
+                grown[:size] = self._matrix
+                self._matrix = grown
+            self._matrix[size] = vec
+            self._entries.append({"q": question, "a": answer})
+            if self._index is not None:
+                self._index.add(vec[None, :])
+            self._dirty = True
+
+    def save(self):
+        """Persist embeddings and answers if anything was added since the last save"""
+        if not self.enabled or not self._dirty:
+            return
+        with self._lock:
+            entries = list(self._entries)
+            vectors = self._matrix[:len(entries)].copy()
+            self._dirty = False
+        np.save(self.vectors_path, vectors)
+        with open(self.answers_path, "w") as f:
+            json.dump(entries, f)
@@ -0,0 +1,15 @@
+import importlib
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """The app, imported with its database and caches in a temporary directory"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        yield importlib.import_module("app")
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,27 @@
+import threading
+from unittest import mock
+
+import ai_common
+
+
+def test_get_client_builds_one_client_under_concurrency(monkeypatch):
+    monkeypatch.setattr(ai_common, "api_key", "test-key")
+    monkeypatch.setattr(ai_common, "_client", None)
+
+    start = threading.Barrier(8)
+    clients = []
+
+    def worker():
+        start.wait()
+        clients.append(ai_common.get_client())
+
+    with mock.patch("google.genai.Client") as client_cls:
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    client_cls.assert_called_once_with(api_key="test-key")
+    assert len(clients) == 8
+    assert all(c is client_cls.return_value for c in clients)
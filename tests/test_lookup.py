@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.mark.parametrize("sub, question, expected", [
+    ("Math", "what is 2+2", "2+2 = 4"),
+    ("Math", "What is corelation?", "Correlation measures the relationship between two variables."),
+    ("Science", "Wat is H2O", "H2O is water"),
+    ("Electronics", "What does LED stand fro?", "Light Emitting Diode"),
+])
+def test_typos_find_prewritten_answer(app_module, sub, question, expected):
+    with app_module.app.test_request_context():
+        assert app_module._lookup_answer(sub, question) == expected
+
+
+@pytest.mark.parametrize("sub, question", [
+    ("Math", "What is 10+3?"),
+    ("Math", "What is 10*3?"),
+    ("Math", "What is 2-2?"),
+    ("Electronics", "What is the unit of electric charge?"),
+    ("Science", "Which planet is nearest to the moon?"),
+])
+def test_different_questions_are_not_matched(app_module, sub, question):
+    with app_module.app.test_request_context():
+        assert app_module._lookup_answer(sub, question) is None
@@ -0,0 +1,32 @@
+import time
+from unittest import mock
+
+import orjson
+
+QUIZ = orjson.dumps([
+    {"question": "What is 2+2?", "options": ["3", "4", "5", "6"], "answer": "4"},
+]).decode()
+
+
+def test_failed_subject_is_not_prefetched(app_module, monkeypatch):
+    async def gemini_batch(client, prompts):
+        return [QUIZ, RuntimeError("400 Bad Request")]
+
+    monkeypatch.setattr(app_module, "get_client", lambda: mock.Mock())
+    monkeypatch.setattr(app_module.ai_async, "gemini_batch", gemini_batch)
+
+    app_module.prefetch_quizzes(99, ["Math", "Chemistry"])
+    deadline = time.monotonic() + 5
+    while 99 in app_module.quiz_prefetching and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    math = app_module.take_prefetched_quiz(99, "Math")
+    assert [q.answer for q in math] == ["4"]
+    assert app_module.take_prefetched_quiz(99, "Chemistry") is None
+
+
+def test_single_quiz_falls_back_to_sample_questions(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "get_client", lambda: None)
+
+    mcqs = app_module.generate_ai_mcqs("Chemistry", num_questions=2)
+    assert len(mcqs) == 2
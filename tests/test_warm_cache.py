@@ -0,0 +1,19 @@
+import json
+
+from scripts.warm_cache import parse_results
+
+
+def batch_line(pairs):
+    text = json.dumps(pairs)
+    return json.dumps({"key": "Math-0", "response": {"candidates": [{"content": {"parts": [{"text": text}]}}]}})
+
+
+def test_parse_results_skips_malformed_pairs():
+    content = batch_line([
+        {"question": " What's 2 plus 2? ", "answer": " 4 "},
+        {"question": 5, "answer": "five"},
+        {"question": "Two and two?", "answer": ["4"]},
+        {"question": "", "answer": "empty"},
+        "not a pair",
+    ])
+    assert parse_results(content) == {"What's 2 plus 2?": "4"}